@@ -1,27 +1,28 @@
 import os
+import pathlib
 import re
 import platform
 import sys
 
+_IMG_RE = re.compile(
+    r'^!\[.*\]\((.*\.(?:png|jpg|jpeg|gif|bmp|svg))\)(?=\r?$)',
+    re.MULTILINE,
+)
+_IS_WINDOWS = platform.system() == "Windows"
+
 def convert_image_paths_to_absolute(markdown_content, base_path):
-    lines = markdown_content.splitlines()
-    updated_lines = []
-
-    for line in lines:
-        # Check if the line is an image reference
-        match = re.match(r'^!\[.*\]\((.*\.(png|jpg|jpeg|gif|bmp|svg))\)$', line)
-        if match:
-            relative_path = match.group(1)
-            absolute_path = os.path.abspath(os.path.join(base_path, relative_path))
-            # Normalize the path for different OS
-            if platform.system() == "Windows":
-                absolute_path = absolute_path.replace('\\', '/')
-            updated_line = line.replace(relative_path, absolute_path)
-            updated_lines.append(updated_line)
-        else:
-            updated_lines.append(line)
-
-    return '\n'.join(updated_lines)
+    base_abs = os.path.abspath(base_path)
+
+    def replace_image_path(match):
+        relative_path = match.group(1)
+        absolute_path = os.path.normpath(os.path.join(base_abs, relative_path))
+        # Normalize the path for different OS
+        if _IS_WINDOWS:
+            absolute_path = absolute_path.replace('\\', '/')
+        return match.group(0).replace(relative_path, absolute_path)
+
+    # Rewrite every image reference line in a single pass (CRLF lines included)
+    return _IMG_RE.sub(replace_image_path, markdown_content)
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
@@ -32,8 +33,7 @@ if __name__ == "__main__":
     base_path = os.path.dirname(os.path.abspath(markdown_filepath))
 
     # Read the markdown file
-    with open(markdown_filepath, 'r', encoding='utf-8') as file:
-        markdown_content = file.read()
+    markdown_content = pathlib.Path(markdown_filepath).read_text(encoding='utf-8')
 
     # Convert image paths to absolute paths
     updated_markdown = convert_image_paths_to_absolute(markdown_content, base_path)
@@ -3,76 +3,106 @@ import sys
 import re
 import urllib.parse
 
+# 줄마다 쓰는 패턴은 모듈 로드 시 한 번만 컴파일합니다.
+# 임베드 마크다운(.md)과 이미지 참조를 한 패턴으로 찾고 확장자로 구분합니다.
+_ASSET_RE = re.compile(r'^!\[.*\]\((?P<path>.*\.(?P<ext>md|png|jpg|jpeg|gif|svg|webp))\)$')
+_IMAGE_SUB_RE = re.compile(r'\(.*\.(png|jpg|jpeg|gif|svg|webp)\)')
+
 def read_markdown_file(filepath):
-    with open(filepath, 'r', encoding='utf-8') as file:
-        return file.read()
+    # 텍스트 모드의 점진적 디코딩/개행 변환 대신 한 번에 읽어 디코딩합니다.
+    # 줄바꿈(\r\n 포함)은 호출하는 쪽의 splitlines()가 처리합니다.
+    with open(filepath, 'rb') as file:
+        return file.read().decode('utf-8')
 
 def flatten_markdown(filepath, base_path=None, export_base_path=None, is_root=True):
     if base_path is None:
         base_path = os.path.dirname(filepath)
     if export_base_path is None:
         export_base_path = base_path
+    # 기준 경로를 미리 절대 경로로 바꿔 두면, 줄마다 abspath로 현재 디렉터리를 다시 조회하지 않고
+    # normpath만으로 같은 결과를 얻습니다.
+    base_path = os.path.abspath(base_path)
+    export_base_path = os.path.abspath(export_base_path)
 
-    content = read_markdown_file(filepath)
-    lines = content.splitlines()
+    # 같은 파일이 여러 번 임베드되어도 한 번의 flatten 안에서는 한 번만 읽습니다.
+    # 하위 파일의 줄도 모두 같은 리스트에 모아 마지막에 한 번만 join합니다.
     flattened_content = []
-    
+    _flatten_into(flattened_content, filepath, base_path, export_base_path, is_root, {}, ())
+    return '\n'.join(flattened_content)
+
+def _flatten_into(flattened_content, filepath, base_path, export_base_path, is_root, contents, ancestors):
+    """
+    flattened_content: 결과 줄을 덧붙일 리스트
+    contents: 절대 경로 -> 파일 내용 캐시
+    ancestors: 현재 파일까지 임베드해 온 파일들의 절대 경로 (순환 임베드 감지용)
+    """
+    abs_path = os.path.abspath(filepath)
+    content = contents.get(abs_path)
+    if content is None:
+        content = contents[abs_path] = read_markdown_file(filepath)
+    ancestors = ancestors + (abs_path,)
+    lines = content.splitlines()
+
     # YAML frontmatter 처리 - 하위 마크다운에서만 무시
-    in_frontmatter = False
-    for i, line in enumerate(lines):
-        # frontmatter 시작 확인
-        if i == 0 and line.strip() == '---':
-            in_frontmatter = True
-            if is_root:  # 최상위 마크다운인 경우 frontmatter 포함
-                flattened_content.append(line)
-            continue
-        # frontmatter 종료 확인
-        if in_frontmatter and line.strip() == '---':
-            in_frontmatter = False
-            if is_root:  # 최상위 마크다운인 경우 frontmatter 포함
-                flattened_content.append(line)
-            continue
-        # frontmatter 내부 처리
-        if in_frontmatter:
-            if is_root:  # 최상위 마크다운인 경우 frontmatter 포함
-                flattened_content.append(line)
+    # 첫 줄이 '---'이면 다음 '---' 줄까지(닫히지 않으면 끝까지)를 frontmatter로 보고 한 번에 잘라냅니다.
+    body_start = 0
+    if lines and lines[0].strip() == '---':
+        body_start = len(lines)
+        for i in range(1, len(lines)):
+            if lines[i].strip() == '---':
+                body_start = i + 1
+                break
+        if is_root:  # 최상위 마크다운인 경우 frontmatter 포함
+            flattened_content.extend(lines[:body_start])
+
+    for line in lines[body_start:]:
+        # 임베드/이미지 패턴은 '!['로 시작해 ')'로 끝나는 줄에만 맞으므로, 나머지 줄은 정규식 없이 그대로 둡니다.
+        if not (line.startswith('![') and line.endswith(')')):
+            flattened_content.append(line)
             continue
 
-        # Check if the line is an embedded markdown reference
-        embed_match = re.match(r'^!\[.*\]\((.*\.md)\)$', line)
-        if embed_match:
-            embedded_path = embed_match.group(1)
+        # 임베드 마크다운과 이미지 참조를 한 번의 매칭으로 구분합니다.
+        asset_match = _ASSET_RE.match(line)
+        if asset_match is None:
+            flattened_content.append(line)
+        elif asset_match.group('ext') == 'md':
+            # embedded markdown reference
+            embedded_path = asset_match.group('path')
             # Decode URL-encoded characters (e.g., %20 -> space)
             embedded_path = urllib.parse.unquote(embedded_path)
-            embedded_full_path = os.path.abspath(os.path.join(base_path, embedded_path))
-            if os.path.isfile(embedded_full_path):
+            embedded_full_path = os.path.normpath(os.path.join(base_path, embedded_path))
+            if embedded_full_path in ancestors:
+                # 자기 자신이나 상위 파일을 다시 임베드하면 무한 재귀가 되므로 건너뜁니다.
+                flattened_content.append(f"<!-- Circular embed skipped: {embedded_path} -->")
+            elif os.path.isfile(embedded_full_path):
                 # 하위 마크다운 처리 시 is_root=False로 설정
-                embedded_content = flatten_markdown(embedded_full_path, 
-                                                 os.path.dirname(embedded_full_path), 
-                                                 export_base_path,
-                                                 is_root=False)
-                flattened_content.append(embedded_content)
+                start = len(flattened_content)
+                _flatten_into(flattened_content,
+                              embedded_full_path,
+                              os.path.dirname(embedded_full_path),
+                              export_base_path,
+                              False,
+                              contents,
+                              ancestors)
+                # 내용이 없는 하위 파일도 기존처럼 빈 줄 하나를 남깁니다.
+                if len(flattened_content) == start:
+                    flattened_content.append('')
             else:
                 flattened_content.append(f"<!-- Embedded file not found: {embedded_path} -->")
         else:
-            # Check if the line is an image reference
-            image_match = re.match(r'^!\[.*\]\((.*\.(png|jpg|jpeg|gif|svg|webp))\)$', line)
-            if image_match:
-                image_path = image_match.group(1)
-                # Decode URL-encoded characters (e.g., %20 -> space)
-                image_path = urllib.parse.unquote(image_path)
-                image_full_path = os.path.abspath(os.path.join(base_path, image_path))
-                # Create a new relative path from the export base path
-                new_relative_path = os.path.relpath(image_full_path, export_base_path)
-                # Replace backslashes with forward slashes and spaces with %20
-                new_relative_path = new_relative_path.replace('\\', '/').replace(' ', '%20')
-                # Reconstruct the line with the updated image path
-                updated_line = re.sub(r'\(.*\.(png|jpg|jpeg|gif|svg|webp)\)', lambda m: f'({new_relative_path})', line)
-                flattened_content.append(updated_line)
-            else:
-                flattened_content.append(line)
-
-    return '\n'.join(flattened_content)
+            # image reference
+            image_path = asset_match.group('path')
+            # Decode URL-encoded characters (e.g., %20 -> space)
+            image_path = urllib.parse.unquote(image_path)
+            image_full_path = os.path.normpath(os.path.join(base_path, image_path))
+            # Create a new relative path from the export base path
+            new_relative_path = os.path.relpath(image_full_path, export_base_path)
+            # Replace backslashes with forward slashes and spaces with %20
+            new_relative_path = new_relative_path.replace('\\', '/').replace(' ', '%20')
+            # Reconstruct the line with the updated image path
+            # 경로의 역슬래시는 위에서 모두 '/'로 바꿨으므로 치환 문자열을 그대로 넘겨도 안전합니다.
+            updated_line = _IMAGE_SUB_RE.sub(f'({new_relative_path})', line)
+            flattened_content.append(updated_line)
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
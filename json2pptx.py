@@ -1,18 +1,22 @@
-import json
+import io
 import os
+import pathlib
 import re
 import argparse
+import unicodedata
 from enum import Enum
+from functools import lru_cache
 from pptx import Presentation
 from PIL import Image
 from pptx.enum.dml import MSO_THEME_COLOR
 from pptx.enum.shapes import PP_PLACEHOLDER
 from pptx.enum.text import PP_ALIGN, MSO_ANCHOR
-from utils.util import unbullet, orderify, set_highlight, dict_shape, clear_slides, link_to_slide, boldify
+from pptx.oxml.ns import qn
+from pptx.text.text import _Paragraph
+from utils.util import unbullet, orderify, set_highlight, dict_shape, clear_slides, link_to_slide, boldify, name_metadata, cache_image_parts, cache_partnames
 from utils.expand import expand
 from utils.code_highlight import highlight_code, process_codes
-
-pholder = 0
+from utils import fastjson
 
 TEXT_ALIGN = {
     "left": PP_ALIGN.LEFT,
@@ -20,12 +24,24 @@ TEXT_ALIGN = {
     "right": PP_ALIGN.RIGHT,
 }
 
+_ACCENT_2 = MSO_THEME_COLOR.ACCENT_2
+_ACCENT_3 = MSO_THEME_COLOR.ACCENT_3
+
+_A_P_TAG = qn("a:p")
+
+# process_runs가 처리하는 run 스타일 키
+_RUN_STYLE_KEYS = frozenset(("bold", "italic", "monospace", "hyperlink"))
+
+_ENUM_SANITIZE_RE = re.compile(r"\W|^(?=\d)")
+
+# numpad 정렬 값(1~9)을 인덱스로 하는 가로/세로 정렬 계수 (0번은 사용하지 않음)
+_ALIGN_FACTOR_X = (0.0, 0.0, 0.5, 1.0, 0.0, 0.5, 1.0, 0.0, 0.5, 1.0)
+_ALIGN_FACTOR_Y = (0.0, 1.0, 1.0, 1.0, 0.5, 0.5, 0.5, 0.0, 0.0, 0.0)
+# heading level(3~6) -> paragraph level. 3은 8, 나머지는 7
+_HEADING_LEVELS = {3: 8}
+
 def shape_metadata(shape):
-    try:
-        metadata = json.loads(shape.name)
-    except Exception:
-        return {}
-    return metadata if isinstance(metadata, dict) else {}
+    return name_metadata(shape.name)
 
 def layout_placeholder_metadata(shape, slide_layout):
     if not getattr(shape, "is_placeholder", False):
@@ -79,7 +95,7 @@ def get_slide_layout_enum(prs):
         # layout.name 속성이 없을 경우에는 기본 이름 사용
         raw_name = getattr(layout, "name", f"LAYOUT_{idx}")
         # 유효한 enum 멤버 이름으로 변환 (대문자로, 숫자로 시작하는 경우 앞에 '_' 추가)
-        member_name = re.sub(r"\W|^(?=\d)", "_", raw_name.upper())
+        member_name = _ENUM_SANITIZE_RE.sub("_", raw_name.upper())
         if not member_name:
             member_name = f"LAYOUT_{idx}"
         # 중복 방지를 위해 이미 존재하면 인덱스를 추가
@@ -106,14 +122,14 @@ def convert_json_to_pptx(prs, data, layouts, toc=1):
 
         slide_obj.notes_slide.notes_text_frame.text = notes_text
     
-    def add_toc_item(paragraph, item):
+    def add_toc_item(paragraph, item, slides, r_ids):
         title_run = paragraph.add_run()
         title_run.text = item.get("title", "") + '\t'
         index_run = paragraph.add_run()
         slide_no = item.get("index", 0)
         index_run.text = str(slide_no)
         try:
-            link_to_slide(index_run, prs.slides[slide_no])
+            link_to_slide(index_run, slides[slide_no], r_ids)
         except:
             pass
         
@@ -121,27 +137,42 @@ def convert_json_to_pptx(prs, data, layouts, toc=1):
     
     slides_data = data.get("slides", [])
     prev_title = None
+    # 슬라이드 루프에서 반복 사용하는 속성과 함수는 지역 변수로 묶어 둡니다.
+    members_get = layouts.__members__.get
+    slide_layouts = prs.slide_layouts
+    add_slide = prs.slides.add_slide
+    _process_token = process_token
+    # 이미지 경로 -> (width, height). 변환 한 번 동안만 유지합니다.
+    image_sizes = {}
+    _process_runs = process_runs
+    # 기본 레이아웃 인덱스는 슬라이드마다 찾지 않고 한 번만 구합니다.
+    default_layout = members_get("TITLE_AND_CONTENT")
+    default_layout_idx = default_layout.value if default_layout is not None else 0
+    # 같은 layout을 쓰는 슬라이드는 placeholder 구성이 같으므로 p_map을 layout별로 한 번만 만듭니다.
+    layout_cache = {}
     for current_slide_no, slide in enumerate(slides_data):
         layout_name_from_json = slide.get("layout", "title_and_content").upper()
-        try:
-            layout_index = layouts[layout_name_from_json].value
-        except KeyError:
+        member = members_get(layout_name_from_json)
+        if member is not None:
+            layout_index = member.value
+        else:
             # 레이아웃 이름이 Enum에 없을 경우 기본 레이아웃 사용
             print(f'Layout "{layout_name_from_json}" not found. Using default layout.')
-            layout_index = None
-            for layout in layouts:
-                if layout.name == "TITLE_AND_CONTENT":
-                    layout_index = layout.value
-                    break
+            layout_index = default_layout_idx
 
-        slide_layout_idx = prs.slide_layouts[layout_index]
+        slide_layout_idx = slide_layouts[layout_index]
         # print(slide_layout_idx.name)
-        current_slide = prs.slides.add_slide(slide_layout_idx)
+        current_slide = add_slide(slide_layout_idx)
         add_slide_notes(current_slide, slide.get("notes", []))
 
-        p_map = {}
-        for i, pl in enumerate(current_slide.placeholders):
-            p_map.update({i: slide_layout_idx.placeholders[i].placeholder_format.idx})
+        # placeholders 컬렉션은 접근할 때마다 XML을 순회하므로 layout별로 캐시합니다.
+        cached = layout_cache.get(layout_index)
+        if cached is None:
+            placeholder_count = len(current_slide.placeholders)
+            layout_placeholders = list(slide_layout_idx.placeholders)
+            p_map = {i: layout_placeholders[i].placeholder_format.idx for i in range(placeholder_count)}
+            cached = layout_cache[layout_index] = (p_map, layout_placeholders)
+        p_map, layout_placeholders = cached
 
         # 제목을 설정합니다.
         title = slide.get("title", False)
@@ -150,33 +181,36 @@ def convert_json_to_pptx(prs, data, layouts, toc=1):
             p = title_shape.text_frame.paragraphs[0]
             if title:
                 runs = title.get("runs", [])
-                process_runs(runs, p)
+                _process_runs(runs, p)
                 prev_title = runs
             else:
                 if isinstance(prev_title, list):
-                    process_runs(prev_title, p)
+                    _process_runs(prev_title, p)
 
         # Placeholder에 토큰을 처리합니다.
         # grow 룰을 적용하기 위한 타이틀 제외 shape (실제 추가된 순서로)를 모아둠
         
         shapes_no_title = []
         pl_after = False
-        global pholder_no
         pholder_no = 0
-        placeholder_count = len(current_slide.placeholders)
+        placeholder_count = len(p_map)
+        # 슬라이드 placeholder는 idx 조회마다 spTree를 순회하므로 한 번만 모아둡니다.
+        slide_placeholders = {ph.placeholder_format.idx: ph for ph in current_slide.placeholders}
         for pholder_data in slide.get("placeholders", []):
             pholder_no += 1
             if not pholder_data:
                 continue
             if placeholder_count >= pholder_no:
                 try:
-                    current_placeholder = current_slide.placeholders[p_map[pholder_no]]
+                    current_placeholder = slide_placeholders[p_map[pholder_no]]
                 except KeyError:
                     print(f"Error: Placeholder index {pholder_no} exceeds available placeholders.")
                     continue
 
+                # 이미지 정렬 정보를 읽을 layout placeholder는 토큰마다가 아니라 한 번만 찾습니다.
+                layout_ph = layout_placeholders[pholder_no] if pholder_no < len(layout_placeholders) else None
                 for token in pholder_data:
-                    pl_after = process_token(current_placeholder, token, current_slide)
+                    pl_after = _process_token(current_placeholder, token, current_slide, pholder_no, layout_ph, image_sizes)
                     # image이면 picture shape, 텍스트이면 placeholder가 들어있게 될 것.
             else:
                 print(f"Error: Placeholder index {pholder_no} exceeds available placeholders.")
@@ -190,10 +224,10 @@ def convert_json_to_pptx(prs, data, layouts, toc=1):
         shapes = []
         
         for i, shape in enumerate(shapes_no_title):
-            if current_slide.shapes.title == shape:
-                print(current_slide.shapes.title.text_frame.text)
+            if title_shape == shape:
+                print(title_shape.text_frame.text)
                 continue
-            placeholder = current_slide.slide_layout.placeholders[i+1] # 추후 고쳐줘야 한다. 에러나서 안되기 때문에.
+            placeholder = slide_layout_idx.placeholders[i+1] # 추후 고쳐줘야 한다. 에러나서 안되기 때문에.
             shapes.append(dict_shape(shape, placeholder))
         
         # align 적용
@@ -254,44 +288,39 @@ def convert_json_to_pptx(prs, data, layouts, toc=1):
         toc_placeholder = get_content_placeholder(toc_slide)
         toc_data = data.get("toc", []).get("chapters", False)
         if toc_data and toc >= 1 and toc_placeholder:
+            # prs.slides[i]는 매번 sldId 목록을 다시 찾으므로 슬라이드 목록을 한 번만 만들어 둡니다.
+            slides = list(prs.slides)
+            r_ids = {}
             for item in toc_data:
                 p = define_paragraph(toc_placeholder)
                 p.level = 0
-                add_toc_item(p, item)
+                add_toc_item(p, item, slides, r_ids)
                 modules = item.get("modules", False)
                 if modules and toc >=2:
                     for item in modules:
                         p = define_paragraph(toc_placeholder)
                         p.level = 1
-                        add_toc_item(p, item)
+                        add_toc_item(p, item, slides, r_ids)
             
     
 def calc_align(p, width, height, align=5):
 
     # align 값을 정수로 변환 시도, 실패하거나 1~9 범위가 아니면 기본값 5 사용
     
-    try:
-        align_val = int(align)
-    except Exception:
-        align_val = 5
+    if isinstance(align, int):
+        align_val = align
+    else:
+        try:
+            align_val = int(align)
+        except Exception:
+            align_val = 5
     if align_val < 1 or align_val > 9:
         align_val = 5
 
     # numpad 정렬 값에 따른 가로 정렬 계수: 왼쪽=0, 가운데=0.5, 오른쪽=1
-    if align_val in (1, 4, 7):
-        factor_x = 0
-    elif align_val in (2, 5, 8):
-        factor_x = 0.5
-    else:  # align_val in (3, 6, 9)
-        factor_x = 1
-
+    factor_x = _ALIGN_FACTOR_X[align_val]
     # numpad 정렬 값에 따른 세로 정렬 계수: 위=0, 가운데=0.5, 아래=1
-    if align_val in (7, 8, 9):
-        factor_y = 0
-    elif align_val in (4, 5, 6):
-        factor_y = 0.5
-    else:  # align_val in (1, 2, 3)
-        factor_y = 1
+    factor_y = _ALIGN_FACTOR_Y[align_val]
 
     # Placeholder의 좌표와 크기
     p_left = p.left
@@ -328,7 +357,17 @@ def calc_align(p, width, height, align=5):
         }
     return align_to
 
-def process_token(current_placeholder, token, current_slide):
+def image_size(url, cache=None):
+    """이미지 헤더만 읽어 (width, height)를 반환합니다. cache가 주어지면 같은 경로는 다시 열지 않습니다."""
+    size = cache.get(url) if cache is not None else None
+    if size is None:
+        with Image.open(url) as i:
+            size = i.size
+        if cache is not None:
+            cache[url] = size
+    return size
+
+def process_token(current_placeholder, token, current_slide, pholder_no=0, layout_ph=None, image_sizes=None):
 
     match(token.get("type", "")):
         case "paragraph":
@@ -341,11 +380,7 @@ def process_token(current_placeholder, token, current_slide):
             # titlify(p)
             # p.font.color.theme_color = MSO_THEME_COLOR.ACCENT_2
             # p.level = token.get("depth", 0)
-            match(token.get("level", 3)):
-                case 3:
-                    p.level = 8
-                case _:
-                    p.level = 7
+            p.level = _HEADING_LEVELS.get(token.get("level", 3), 7)
             process_runs(token.get("runs", []), p)
         case "block_quote":
             p = define_paragraph(current_placeholder)
@@ -366,24 +401,17 @@ def process_token(current_placeholder, token, current_slide):
             url = token.get("url", "")
             
             try:
-                i = Image.open(url)
-                            
-                global pholder_no
-                
-                dynloc = {"order": pholder_no}
-
-                try:
-                    align_dict = json.loads(current_slide.slide_layout.placeholders[pholder_no].name)
-                    dynloc.update(align_dict)
-                except:
-                    # print('Error: Placeholder name is not JSON format.')
-                    pass
-                
-                align_to = calc_align(current_placeholder, i.width, i.height , dynloc.get("align",5))
-
                 try:
                     current_placeholder.insert_picture(url)
                 except Exception:
+                    # picture placeholder가 아닐 때만 정렬 계산을 위해 이미지 크기가 필요합니다.
+                    width, height = image_size(url, image_sizes)
+                    dynloc = {"order": pholder_no}
+
+                    if layout_ph is not None:
+                        dynloc.update(name_metadata(layout_ph.name))
+
+                    align_to = calc_align(current_placeholder, width, height, dynloc.get("align",5))
 
                     sp = current_placeholder._element
                     sp.getparent().remove(sp)
@@ -396,8 +424,14 @@ def process_token(current_placeholder, token, current_slide):
         case "list":
             children = token.get("children", [])
             if children:
+                add_paragraph = current_placeholder.text_frame.add_paragraph
+                p = None
                 for child in children:
-                    p = define_paragraph(current_placeholder)
+                    # 앞 항목에 텍스트가 들어간 뒤에는 첫 단락을 다시 확인할 필요 없이 바로 새 단락을 추가합니다.
+                    if p is None or p.text == "":
+                        p = define_paragraph(current_placeholder)
+                    else:
+                        p = add_paragraph()
                     # print(child.get("type", ""))
                     p.level = child.get("depth", 0)
                     process_runs(child.get("runs", []), p)
@@ -412,11 +446,18 @@ def process_token(current_placeholder, token, current_slide):
             pass
     return current_placeholder
 
-def process_table(current_placeholder, token, current_slide):
-    import unicodedata
+@lru_cache(maxsize=4096)
+def char_width(c):
+    """전각(W/F) 문자는 2칸, 나머지는 1칸으로 셉니다. 같은 문자는 유니코드 DB를 다시 조회하지 않습니다."""
+    return 2 if unicodedata.east_asian_width(c) in 'WF' else 1
 
+def process_table(current_placeholder, token, current_slide):
     def visual_length(s):
-        return sum(2 if unicodedata.east_asian_width(c) in 'WF' else 1 for c in str(s))
+        s = str(s)
+        # ASCII 문자열은 모두 1칸이므로 문자 단위 조회를 건너뜁니다.
+        if s.isascii():
+            return len(s)
+        return sum(map(char_width, s))
 
     def get_column_weights(head_data, body_data):
         num_cols = len(head_data)
@@ -479,7 +520,8 @@ def process_table(current_placeholder, token, current_slide):
     )
 
     # 테이블의 스타일을 설정
-    shape._element.graphic.graphicData.tbl[0][-1].text = '{72833802-FEF1-4C79-8D5D-14CF1EAF98D9}'
+    tbl = shape._element.graphic.graphicData.tbl
+    tbl[0][-1].text = '{72833802-FEF1-4C79-8D5D-14CF1EAF98D9}'
 
     table = shape.table
 
@@ -498,8 +540,11 @@ def process_table(current_placeholder, token, current_slide):
     weights = get_column_weights(head_data, body_data)
     ratios = normalize_with_cap(weights, cap=dynamic_cap(len(weights)))
     total_width = sizloc["width"]
-    for i, ratio in enumerate(ratios):
-        table.columns[i].width = int(total_width * ratio)
+    # table.columns[i].width는 대입할 때마다 전체 열 너비를 다시 합산하므로,
+    # gridCol에 직접 쓰고 표 전체 너비는 마지막에 한 번만 갱신합니다.
+    for grid_col, ratio in zip(tbl.tblGrid.gridCol_lst, ratios):
+        grid_col.w = int(total_width * ratio)
+    table.notify_width_changed()
     
     return shape
 
@@ -507,39 +552,48 @@ def define_paragraph(placeholder):
     """
     Placeholder에서 첫 번째 단락을 가져오고, 텍스트가 비어있으면 새 단락을 추가합니다.
     """
-    if placeholder.text_frame.paragraphs[0].text != "":
-        paragraph = placeholder.text_frame.add_paragraph()
-    else:
-        paragraph = placeholder.text_frame.paragraphs[0]
-    return paragraph
+    text_frame = placeholder.text_frame
+    # text_frame.paragraphs는 모든 단락의 proxy를 만들기 때문에 첫 번째 <a:p>만 직접 감쌉니다.
+    first_p = text_frame._txBody.find(_A_P_TAG)
+    if first_p is not None:
+        paragraph = _Paragraph(first_p, text_frame)
+        if paragraph.text == "":
+            return paragraph
+    return text_frame.add_paragraph()
 
 def process_runs(runs, paragraph):
     """
     주어진 runs 리스트를 사용하여 paragraph에 텍스트와 스타일을 설정합니다.
     각 run은 텍스트와 스타일 정보를 포함하는 딕셔너리입니다.
     """
+    add_run = paragraph.add_run
     for run in runs:
-        r = paragraph.add_run()
-        r.text = run.get("text", "")
+        r = add_run()
+        get = run.get
+        r.text = get("text", "")
+        # 스타일 없이 텍스트만 있는 run이 대부분이므로 바로 다음 run으로 넘어갑니다.
+        if _RUN_STYLE_KEYS.isdisjoint(run):
+            continue
         font = r.font
-        if 'bold' in run:
-            font.color.theme_color = MSO_THEME_COLOR.ACCENT_3
+        if get('bold'):
+            font.color.theme_color = _ACCENT_3
             boldify(r)
             font.bold = True
-        if 'italic' in run:
+        if get('italic'):
             boldify(r)
             font.italic = True
             font.underline = True
-        if 'monospace' in run:
+        if get('monospace'):
             boldify(r)
             r = set_highlight(r, 'EEEEEE')
-            r.font.color.theme_color = MSO_THEME_COLOR.ACCENT_2
+            r.font.color.theme_color = _ACCENT_2
             # r.font.color.rgb = RGBColor(248, 104, 107)
             # print(font.size)
             # 현재 폰트 사이즈를 알아내는 게 쉽지 않다.
-        if 'hyperlink' in run:
+        hyperlink = get('hyperlink')
+        if hyperlink is not None:
             boldify(r)
-            r.hyperlink.address = run.get("hyperlink", "https://google.com")
+            r.hyperlink.address = hyperlink
 
 def frontmatter_named_shapes(frontmatter):
     named_shapes = {}
@@ -577,7 +631,14 @@ def add_title_slide(prs, frontmatter):
 
     apply_named_shapes(slide, title_slide_layout, frontmatter_named_shapes(frontmatter))
 
-def main(data=None, argv=None):
+_PARSER = None
+
+def get_parser():
+    """CLI 인자 파서를 한 번만 만들어 재사용합니다. main()을 라이브러리로 여러 번 호출할 때 파서 생성 비용을 줄입니다."""
+    global _PARSER
+    if _PARSER is not None:
+        return _PARSER
+
     parser = argparse.ArgumentParser(
         description="Convert JSON to PPTX using python-pptx"
     )
@@ -604,6 +665,11 @@ def main(data=None, argv=None):
     parser.add_argument(
         "--no-toc", action="store_true", help="Skip generating the table of contents slide"
     )
+    _PARSER = parser
+    return parser
+
+def main(data=None, argv=None, *, return_bytes=False):
+    parser = get_parser()
     if argv is None and data is not None:
         argv = []
     args = parser.parse_args(argv)
@@ -635,8 +701,7 @@ def main(data=None, argv=None):
             if not os.path.exists(args.input):
                 print(f"Error: JSON file '{args.input}' does not exist.")
                 return
-            with open(args.input, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = fastjson.loads(pathlib.Path(args.input).read_bytes())
 
     # 참조 PPTX 파일이 지정되었고 존재하면 이를 사용합니다.
     if args.ref and os.path.exists(args.ref):
@@ -647,7 +712,12 @@ def main(data=None, argv=None):
     else:
         # 참조 파일이 없으면 새 프레젠테이션 생성
         prs = Presentation()
-        
+
+    # 같은 이미지를 여러 슬라이드에 넣을 때 이미지 part를 재사용합니다.
+    cache_image_parts(prs)
+    # 노트 슬라이드/이미지 part 번호를 매번 패키지 전체를 순회하지 않고 이어서 매깁니다.
+    cache_partnames(prs)
+
     add_title_slide(prs, data['frontmatter'])
 
     layouts = get_slide_layout_enum(prs)
@@ -657,6 +727,13 @@ def main(data=None, argv=None):
     # JSON 데이터를 기반으로 PPTX 변환 로직 실행
     convert_json_to_pptx(prs, data, layouts=layouts, toc=0 if args.no_toc else 1)
 
+    # 바이트 반환 모드: 라이브러리 호출 시 디스크에 쓰지 않고 메모리에서 저장
+    # 명시적인 키워드 인자이므로 환경 변수로 켜진 return_pptx보다 우선합니다.
+    if return_bytes:
+        buffer = io.BytesIO()
+        prs.save(buffer)
+        return buffer.getvalue()
+
     # Presentation 객체 반환 모드
     if args.return_pptx:
         return prs
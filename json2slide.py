@@ -2,40 +2,160 @@ import argparse
 import json
 import mistune
 import os
-from copy import deepcopy
+import pathlib
 from urllib import parse
+from utils import fastjson
 
 
 def load_json(file_path):
     """JSON 파일을 읽어 딕셔너리로 변환"""
-    with open(file_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return fastjson.loads(pathlib.Path(file_path).read_bytes())
+
+# 토큰에 attrs가 없을 때 돌려줄 읽기 전용 기본값 (get마다 새 dict를 만들지 않도록)
+_NO_ATTRS = {}
+
+# 인라인 토큰 type -> run 스타일 키 (link는 값이 url이라 따로 처리)
+_STYLE_FLAGS = {'strong': 'bold', 'emphasis': 'italic', 'codespan': 'monospace'}
+
+# shapes 주석 값을 인라인 마크다운으로 파싱할 때 매번 파서를 새로 만들지 않도록 재사용합니다.
+_INLINE_MARKDOWN = mistune.create_markdown(renderer=None)
+
+def paragraph(children):
+    # 재귀 대신 (token, style) 스택으로 인라인 토큰을 전위 순회합니다.
+    runs = []
+    stack = [(token, {}) for token in reversed(children)]
+    while stack:
+        token, style = stack.pop()
+        token_type = token.get('type')
+        # 스타일이 바뀌는 토큰에서만 style을 복사하고, 나머지는 그대로 물려줍니다.
+        flag = _STYLE_FLAGS.get(token_type)
+        if flag is not None:
+            style = {**style, flag: True}
+        elif token_type == 'link' and 'url' in token.get('attrs', _NO_ATTRS):
+            style = {**style, 'hyperlink': token['attrs']['url']}
+        if 'raw' in token:
+            # {**style, ...} 언패킹보다 copy 후 대입이 빠릅니다.
+            run = style.copy()
+            run['text'] = token['raw']
+            runs.append(run)
+        token_children = token.get('children')
+        if token_children:
+            stack.extend((child, style) for child in reversed(token_children))
+    return runs
+
+def runs_to_text(runs):
+    text = ''.join([run['text'] for run in runs])
+    return text
+
+def markdown_inline_to_runs(text):
+    tokens = _INLINE_MARKDOWN(text or "")
+    runs = []
+    for token in tokens:
+        if token.get("type") in ("paragraph", "block_text"):
+            runs.extend(paragraph(token.get("children", ())))
+    return runs
+
+def process_list(list_token, ordered=False):
+    # 재귀 대신 (token, depth, ordered) 스택으로 전위 순회하며 list_item을 평탄하게 모읍니다.
+    result = []
+    stack = [(child, 0, ordered) for child in reversed(list_token.get("children", ()))]
+    while stack:
+        token, depth, item_ordered = stack.pop()
+        token_type = token.get("type")
+
+        if token_type == "list":
+            # 리스트 토큰을 만나면 depth를 1 증가시키고, 자식 항목은 이 리스트의 ordered를 따릅니다.
+            child_ordered = token.get("attrs", _NO_ATTRS).get("ordered", False)
+            stack.extend((child, depth + 1, child_ordered) for child in reversed(token.get("children", ())))
+
+        elif token_type == "list_item":
+            # list_item 내부에서:
+            # - 블록 텍스트는 현재 depth의 list_item으로 먼저 내보냅니다.
+            # - 중첩 리스트는 현재 depth를 그대로 넘기고, list 처리에서 depth가 증가됩니다.
+            # - 그 밖의 자식(느슨한 리스트의 paragraph 등)은 최상위 리스트의 ordered를 따릅니다.
+            runs = None
+            rest = []
+            for child in token.get("children", ()):
+                if child.get("type") == "block_text":
+                    runs = paragraph(child.get("children", ()))
+                else:
+                    rest.append(child)
+            if runs:
+                result.append({"type": "list_item", "depth": depth, "runs": runs, "ordered": item_ordered})
+            stack.extend((child, depth, ordered) for child in reversed(rest))
+
+        elif token_type == "block_text" or token_type == "paragraph":
+            # 단순 block_text는 현재 depth의 list_item으로 변환합니다.
+            result.append({
+                "type": "list_item",
+                "depth": depth,
+                "runs": paragraph(token.get("children", ())),
+                "ordered": item_ordered
+            })
+
+    return {"type": "list", "children": result}
+
+def process_table(table):
+    def process_cell(cell):
+        return {
+            'type': 'cell',
+            'runs': paragraph(cell.get('children', ())),
+            'align': cell.get('attrs', _NO_ATTRS).get('align', '')
+        }
+    head_data = table.get('children',[[]])[0].get('children',False)
+    body_data = table.get('children',[[],[]])[1].get('children',False)
+
+    result = {
+        'type': 'table',
+        'head': [],
+        'body': [],
+    }
+
+    if head_data:
+        for cell in head_data:
+            result['head'].append(process_cell(cell))
+    if body_data:
+        for row in body_data:
+            row_data = []
+            for cell in row.get('children', ()):
+                row_data.append(process_cell(cell))
+            result['body'].append(row_data)
+    return result
 
 def process_json(data):
-    NEW_SLIDE = {
-        'title': {},
-        'layout': '', 
-        'placeholders': [[]],
-        'notes': [],
-        'shapes': {},
+    def new_slide():
+        # deepcopy 대신 매번 새 리터럴을 만듭니다.
+        return {
+            'title': {},
+            'layout': '',
+            'placeholders': [[]],
+            'notes': [],
+            'shapes': {},
         }
 
     processed = {}
     processed['frontmatter'] = data['frontmatter']
     processed['toc'] = {'chapters': []}
     processed['slides'] = []
-    processed['slides'].append(deepcopy(NEW_SLIDE))
+    processed['slides'].append(new_slide())
     tokens = data['tokens']
     current_slide = 0
     current_placeholder = 0
-    prev_token = {}
+    # 이전 토큰은 consume 값만 비교하므로 그 값만 기억합니다.
+    prev_consume = None
+    # 현재 슬라이드의 placeholders 리스트와 현재 placeholder를 인덱싱 없이 바로 쓰도록 붙잡아 둡니다.
+    slide_placeholders = processed['slides'][current_slide]['placeholders']
+    placeholder = slide_placeholders[current_placeholder]
 
     def finalize_slide(finalize_doc=False):
-        nonlocal current_slide, current_placeholder # This allows us to modify current_slide
+        nonlocal current_slide, current_placeholder, slide_placeholders, placeholder # This allows us to modify current_slide
         current_slide += 1
         current_placeholder = 0
         if not finalize_doc:
-            processed['slides'].append(deepcopy(NEW_SLIDE))
+            slide = new_slide()
+            processed['slides'].append(slide)
+            slide_placeholders = slide['placeholders']
+            placeholder = slide_placeholders[0]
 
     def determine_layout(slide):
         if slide['layout'] != '':
@@ -69,164 +189,26 @@ def process_json(data):
         return layout
 
     def add_token(token, consume="shared"):
-        nonlocal current_placeholder, current_slide, prev_token
+        nonlocal prev_consume
 
-        is_shared = lambda t: t.get("consume") == "shared"
-        placeholder = processed["slides"][current_slide]["placeholders"][current_placeholder]
-
-        if not placeholder or (is_shared(prev_token) and consume == "shared"):
+        if not placeholder or (prev_consume == "shared" and consume == "shared"):
             pass  # 기존 placeholder 그대로 사용
         else:
             add_placeholder()
 
-        # 항상 최신 placeholder로 갱신해서 append
-        placeholder = processed["slides"][current_slide]["placeholders"][current_placeholder]
-        placeholder.append({**token, "consume": consume})
+        # add_placeholder가 placeholder를 최신 것으로 바꿔 두므로 바로 append
+        # 호출하는 쪽은 항상 새로 만든 dict를 넘기므로 복사하지 않고 consume만 덧붙입니다.
+        token["consume"] = consume
+        placeholder.append(token)
 
-        prev_token = {"consume": consume, **token}
+        prev_consume = consume
 
     def add_placeholder():
-        nonlocal current_placeholder, current_slide
-        processed['slides'][current_slide]['placeholders'].append([])
+        nonlocal current_placeholder, placeholder
+        placeholder = []
+        slide_placeholders.append(placeholder)
         current_placeholder += 1
 
-    def paragraph(children):
-        def process_token(token, current_style):
-            new_style = current_style.copy()
-            token_type = token.get('type')
-            if token_type == 'strong':
-                new_style['bold'] = True
-            elif token_type == 'emphasis':
-                new_style['italic'] = True
-            elif token_type == 'codespan':
-                new_style['monospace'] = True
-            elif token_type == 'link':
-                if 'attrs' in token and 'url' in token['attrs']:
-                    new_style['hyperlink'] = token['attrs']['url']
-            runs = []
-            if 'raw' in token:
-                runs.append({**new_style, 'text': token['raw']})
-            if 'children' in token:
-                for child in token['children']:
-                    runs.extend(process_token(child, new_style))
-            return runs
-        
-        all_runs = []
-        for token in children:
-            all_runs.extend(process_token(token, {}))
-        return all_runs
-
-    def runs_to_text(runs):
-        text = ''.join([run['text'] for run in runs])
-        return text
-
-    def markdown_inline_to_runs(text):
-        md = mistune.create_markdown(renderer=None)
-        tokens = md(text or "")
-        runs = []
-        for token in tokens:
-            if token.get("type") in ("paragraph", "block_text"):
-                runs.extend(paragraph(token.get("children", [])))
-        return runs
-
-    def process_list(list_token, ordered=False):
-        def iter_token(token, depth=0, ordered=ordered):
-            token_type = token.get("type")
-
-            if token_type == "list":
-                # 리스트 토큰을 만나면 depth를 1 증가시키고 자식 항목들을 평탄하게 반환합니다.
-                new_depth = depth + 1
-                items = []
-                ordered = token.get("attrs", {}).get("ordered", False)
-                for child in token.get("children", []):
-                    result = iter_token(child, new_depth, ordered)
-                    if result:
-                        if isinstance(result, list):
-                            items.extend(result)
-                        else:
-                            items.append(result)
-                return items
-
-            elif token_type == "list_item":
-                # list_item 내부에서:
-                # - 블록 텍스트는 현재 depth의 list_item으로 변환합니다.
-                # - 자식 중 리스트가 있다면, 현재 depth를 그대로 넘깁니다.
-                runs = None
-                extra_items = []
-                for child in token.get("children", []):
-                    if child.get("type") == "list":
-                        # 중첩 리스트: 여기서는 depth를 증가시키지 않고, iter_token의 list 처리에서 증가됩니다.
-                        nested = iter_token(child, depth)
-                        if nested:
-                            if isinstance(nested, list):
-                                extra_items.extend(nested)
-                            else:
-                                extra_items.append(nested)
-                    elif child.get("type") == "block_text":
-                        runs = paragraph(child.get("children", []))
-                    else:
-                        processed = iter_token(child, depth)
-                        if processed:
-                            if isinstance(processed, list):
-                                extra_items.extend(processed)
-                            else:
-                                extra_items.append(processed)
-                result = []
-                if runs:
-                    result.append({"type": "list_item", "depth": depth, "runs": runs, "ordered": ordered})
-                result.extend(extra_items)
-                return result
-
-            elif token_type == "block_text" or token_type == "paragraph":
-                # 단순 block_text는 현재 depth의 list_item으로 변환합니다.
-                return {
-                    "type": "list_item",
-                    "depth": depth,
-                    "runs": paragraph(token.get("children", [])),
-                    "ordered": ordered
-                }
-
-            return None
-
-        result = []
-
-        for child in list_token.get("children", []):
-            processed = iter_token(child, 0)
-            if processed:
-                if isinstance(processed, list):
-                    result.extend(processed)
-                else:
-                    result.append(processed)
-
-        return {"type": "list", "children": result}
-    
-    def process_table(table):
-        def process_cell(cell):
-            return {
-                'type': 'cell',
-                'runs': paragraph(cell.get('children', [])),
-                'align': cell.get('attrs', {}).get('align', '')
-            }
-        head_data = table.get('children',[[]])[0].get('children',False)
-        body_data = table.get('children',[[],[]])[1].get('children',False)
-        
-        result = {
-            'type': 'table',
-            'head': [],
-            'body': [],
-        }
-        
-        if head_data:
-            for cell in head_data:
-                result['head'].append(process_cell(cell))
-        if body_data:
-            for row in body_data:
-                row_data = []
-                for cell in row.get('children', []):
-                    row_data.append(process_cell(cell))
-                result['body'].append(row_data)
-        return result
-
     for token in tokens:
         type = token['type']
 
@@ -294,7 +276,7 @@ def process_json(data):
                         )
                     case 'image':
                         url_o = child["attrs"]["url"]
-                        url = url_o if parse.unquote(url_o) == url_o else parse.unquote(url_o)
+                        url = parse.unquote(url_o)
                         alt = child["children"][0]["raw"]
                         alt_dict = {} if alt == "" else {"alt": alt}
                         add_token(
@@ -306,12 +288,12 @@ def process_json(data):
                             consume="monopoly"
                         )
             case 'list':
-                add_token(process_list(token,token.get("attrs", {}).get("ordered", False)))
+                add_token(process_list(token,token.get("attrs", _NO_ATTRS).get("ordered", False)))
             case 'block_code':
                 add_token(
                     {
                         "type": "code",
-                        "lang": token.get("attrs", {}).get("info", ""),
+                        "lang": token.get("attrs", _NO_ATTRS).get("info", ""),
                         "raw": token["raw"],
                     }
                 )
@@ -389,8 +371,8 @@ def main():
         else:
             # JSON 문자열로 처리
             try:
-                data = json.loads(args.input)
-            except json.JSONDecodeError:
+                data = fastjson.loads(args.input)
+            except ValueError:
                 print("Error: Invalid JSON string provided")
                 return
     else:
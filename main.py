@@ -12,10 +12,13 @@ from json2pptx import main as json2pptx_main
 from flatten import flatten_markdown
 from md2ppt.templates import list_templates, template_path
 
-def save_debug_data(data, filename):
-    """디버그 데이터를 JSON 파일로 저장합니다."""
+def save_debug_data(data, filename, compact=False):
+    """디버그 데이터를 JSON 파일로 저장합니다. compact이면 들여쓰기 없이 한 줄로 저장합니다."""
     with open(filename, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+        if compact:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        else:
+            json.dump(data, f, ensure_ascii=False, indent=4)
     print(f"Debug data saved to {filename}")
 
 def main():
@@ -24,6 +27,7 @@ def main():
     parser.add_argument("-o", "--output", help="Output PPTX file path (default: {input_filename}.pptx)")
     parser.add_argument("-d", "--debug", action="store_true", help="Save intermediate processing results to files")
     parser.add_argument("--debug-dir", default="debug", help="Directory to save debug files (default: 'debug')")
+    parser.add_argument("--debug-compact", action="store_true", help="Save debug JSON files without indentation (faster for large decks)")
     parser.add_argument("-t", "--template", default="default", help="Built-in template name (default: default)")
     parser.add_argument("--list-templates", action="store_true", help="List built-in templates and exit")
     parser.add_argument("-r", "--ref", help="Reference PPTX file path for styling. Overrides --template.")
@@ -70,7 +74,7 @@ def main():
         # 디버그 모드에서 중간 결과 저장
         if args.debug:
             debug_json_file = os.path.join(args.debug_dir, "1_markdown_to_json.json")
-            save_debug_data(json_data, debug_json_file)
+            save_debug_data(json_data, debug_json_file, compact=args.debug_compact)
 
         # 3. JSON 딕셔너리를 슬라이드 딕셔너리로 변환
         print("Converting JSON to slide format...")
@@ -79,7 +83,7 @@ def main():
         # 디버그 모드에서 중간 결과 저장
         if args.debug:
             debug_slide_file = os.path.join(args.debug_dir, "2_json_to_slide.json")
-            save_debug_data(slide_data, debug_slide_file)
+            save_debug_data(slide_data, debug_slide_file, compact=args.debug_compact)
 
         # 4. 슬라이드 딕셔너리를 PPTX로 변환
         print("Converting slide format to PPTX...")
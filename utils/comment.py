@@ -1,7 +1,9 @@
+# 패턴 문자열은 모듈 수준에 한 번만 정의합니다.
+# mistune이 등록된 패턴 문자열을 자체 스캐너 정규식으로 합쳐 컴파일하므로 여기서는 컴파일하지 않습니다.
+# pattern = r'^\[(?P<key>[^\]]+)\]:\s*#\s*\((?P<value>[^)]+)\)\s*$'
+_COMMENT_BLOCK_PATTERN = r'^\[(?P<key>[^\]]+)\]:\s*#\s*\((?P<value>.+)\)\s*$'
+
 def plugin_comment_block(md):
-    # 패턴 문자열로 정의합니다.
-    # pattern = r'^\[(?P<key>[^\]]+)\]:\s*#\s*\((?P<value>[^)]+)\)\s*$'
-    pattern = r'^\[(?P<key>[^\]]+)\]:\s*#\s*\((?P<value>.+)\)\s*$'
     # 콜백 함수는 (self, m, state)를 받고, 토큰을 상태에 추가한 후 새 커서 위치를 정수로 반환해야 합니다.
     def parse_comment_block(self, m, state):
         token = {
@@ -14,5 +16,5 @@ def plugin_comment_block(md):
         return m.end()
     
     # 'ref_link'보다 먼저 처리되도록 등록합니다.
-    md.block.register('comment_block', pattern, parse_comment_block, before='ref_link')
+    md.block.register('comment_block', _COMMENT_BLOCK_PATTERN, parse_comment_block, before='ref_link')
     return md
\ No newline at end of file
@@ -1,84 +1,63 @@
-def expand(shapes, idx, p):
+EMU_PER_INCH = 914400
 
-    def coordinatify(shape):
-        return {
-            **shape,
-            "right": shape["left"] + shape["width"],
-            "bottom": shape["top"] + shape["height"],
-            "tl": (shape["top"], shape["left"]),
-            "tr": (shape["top"], shape["left"] + shape["width"]),
-            "bl": (shape["top"] + shape["height"], shape["left"]),
-            "br": (shape["top"] + shape["height"], shape["left"] + shape["width"]),
-        }
 
-    def are_related(foo, bar, direction):
-        if direction == "left":
-            # bar가 foo의 왼쪽에 있고, 세로(y축) 범위가 겹치는지
-            return bar["left"] + bar["width"] <= foo["left"] and \
-                max(foo["top"], bar["top"]) <= min(foo["top"] + foo["height"], bar["top"] + bar["height"])
+def expand(shapes, idx, p):
+    """
+    shapes[idx]가 상하좌우로 늘어날 수 있는 거리를 계산합니다.
+    각 방향으로 겹치는 도형이 있으면 가장 가까운 도형까지(margin 제외), 없으면 캔버스 끝까지의 거리입니다.
+    """
+    # 도형마다 (left, top, right, bottom, margin) 튜플을 한 번만 만들고,
+    # 같은 순회에서 모든 도형을 감싸는 캔버스 경계도 함께 구합니다.
+    boxes = []
+    canvas_left = canvas_top = float("inf")
+    canvas_right = canvas_bottom = float("-inf")
+    for shape in shapes:
+        b_left = shape["left"]
+        b_top = shape["top"]
+        b_right = b_left + shape["width"]
+        b_bottom = b_top + shape["height"]
+        boxes.append((b_left, b_top, b_right, b_bottom, shape.get("margin", 0)))
+        if b_left < canvas_left:
+            canvas_left = b_left
+        if b_top < canvas_top:
+            canvas_top = b_top
+        if b_right > canvas_right:
+            canvas_right = b_right
+        if b_bottom > canvas_bottom:
+            canvas_bottom = b_bottom
 
-        elif direction == "right":
-            # bar가 foo의 오른쪽에 있고, 세로(y축) 범위가 겹치는지
-            return bar["left"] >= foo["left"] + foo["width"] and \
-                max(foo["top"], bar["top"]) <= min(foo["top"] + foo["height"], bar["top"] + bar["height"])
+    f_left, f_top, f_right, f_bottom, f_margin = boxes[idx]
+    left = right = above = below = None
 
-        elif direction == "above":
-            # bar가 foo의 위에 있고, 가로(x축) 범위가 겹치는지
-            return bar["top"] + bar["height"] <= foo["top"] and \
-                max(foo["left"], bar["left"]) <= min(foo["left"] + foo["width"], bar["left"] + bar["width"])
+    for i, (b_left, b_top, b_right, b_bottom, b_margin) in enumerate(boxes):
+        if i == idx:
+            continue
+        # 세로(y축) 범위가 겹치면 좌우, 가로(x축) 범위가 겹치면 상하 관계
+        y_overlap = max(f_top, b_top) <= min(f_bottom, b_bottom)
+        x_overlap = max(f_left, b_left) <= min(f_right, b_right)
+        if not (y_overlap or x_overlap):
+            continue
+        # 두 도형 중 더 큰 margin(inch)을 EMU로 변환
+        margin = int((f_margin if f_margin > b_margin else b_margin) * EMU_PER_INCH)
 
-        elif direction == "below":
-            # bar가 foo의 아래에 있고, 가로(x축) 범위가 겹치는지
-            return bar["top"] >= foo["top"] + foo["height"] and \
-                max(foo["left"], bar["left"]) <= min(foo["left"] + foo["width"], bar["left"] + bar["width"])
+        if y_overlap:
+            if b_right <= f_left:
+                gap = abs(f_left - b_right) - margin
+                left = gap if left is None or gap < left else left
+            if b_left >= f_right:
+                gap = abs(f_right - b_left) - margin
+                right = gap if right is None or gap < right else right
+        if x_overlap:
+            if b_bottom <= f_top:
+                gap = abs(f_top - b_bottom) - margin
+                above = gap if above is None or gap < above else above
+            if b_top >= f_bottom:
+                gap = abs(f_bottom - b_top) - margin
+                below = gap if below is None or gap < below else below
 
-    def find_canvas(shapes):
-        top = min([shape["top"] for shape in shapes])
-        left = min([shape["left"] for shape in shapes])
-        width = max([shape["left"] + shape["width"] for shape in shapes]) - left
-        height = max([shape["top"] + shape["height"] for shape in shapes]) - top
-        s = {
-            "top": top,
-            "left": left,
-            "width": width,
-            "height": height,
-        }
-        return coordinatify(s)
-    
-    def greater_margin(foo, bar):
-        def emu(val):
-            return int(val * 914400)
-        f = foo.get("margin",0)
-        b = bar.get("margin",0)
-        return emu(f) if  f > b else emu(b)
-    
-    canvas = find_canvas(shapes)
-    sphs = [coordinatify(shape) for shape in shapes]
-    dir = {
-        "d" : ("left", "right", "above", "below"),
-        "left": ("left", "right"),
-        "right": ("right", "left"),
-        "above": ("top", "bottom"),
-        "below": ("bottom", "top")
+    return {
+        'left': left if left is not None else abs(f_left - canvas_left),
+        'right': right if right is not None else abs(f_right - canvas_right),
+        'above': above if above is not None else abs(f_top - canvas_top),
+        'below': below if below is not None else abs(f_bottom - canvas_bottom),
     }
-    
-    foo = sphs.pop(idx)
-    bars = sphs
-    
-    deltas = {
-        'left' : 0,
-        'right' : 0,
-        'above' : 0,
-        'below' : 0,
-    }
-    
-    for d in dir['d']:
-        related = [s for s in bars if are_related(foo, s, d)]
-        if bool(related):
-            most_close = min(abs(foo[dir[d][0]]-bar[dir[d][1]]) - greater_margin(foo,bar) for bar in related)
-            deltas.update({d: most_close})
-        else:
-            reaching_canvas = abs(foo[dir[d][0]]-canvas[dir[d][0]])
-            deltas.update({d: reaching_canvas})
-
-    return deltas
\ No newline at end of file
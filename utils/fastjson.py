@@ -0,0 +1,13 @@
+"""
+설치되어 있으면 orjson, 없으면 ujson, 둘 다 없으면 표준 json으로 JSON을 파싱합니다.
+loads는 str과 UTF-8 bytes를 모두 받으며, 파싱 오류는 모두 ValueError의 하위 클래스입니다.
+"""
+try:
+    import orjson as _json
+except ImportError:
+    try:
+        import ujson as _json
+    except ImportError:
+        import json as _json
+
+loads = _json.loads
@@ -1,33 +1,63 @@
-import json
-import os
-import tempfile
+from functools import lru_cache
+from utils import fastjson
 from lxml import etree
-from pptx import Presentation
 from pptx.enum.lang import MSO_LANGUAGE_ID
-from pptx.oxml.xmlchemy import OxmlElement
 from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.opc.packuri import PackURI
+
+_LANG_EN = MSO_LANGUAGE_ID.ENGLISH_US
+_LANG_KO = MSO_LANGUAGE_ID.KOREAN
+
+_A_URI = "http://schemas.openxmlformats.org/drawingml/2006/main"
+_BUNONE_TAG = f"{{{_A_URI}}}buNone"
+_BUAUTONUM_TAG = f"{{{_A_URI}}}buAutoNum"
+_DEFRPR_TAG = f"{{{_A_URI}}}defRPr"
+_LATIN_TAG = f"{{{_A_URI}}}latin"
+_EA_TAG = f"{{{_A_URI}}}ea"
+_HIGHLIGHT_TAG = f"{{{_A_URI}}}highlight"
+_SRGBCLR_TAG = f"{{{_A_URI}}}srgbClr"
+_LN_TAG = f"{{{_A_URI}}}ln"
+_SOLIDFILL_TAG = f"{{{_A_URI}}}solidFill"
+_SCHEMECLR_TAG = f"{{{_A_URI}}}schemeClr"
+_ALPHA_TAG = f"{{{_A_URI}}}alpha"
+# orderify에서 p.level을 인덱스로 사용하는 번호 스타일
+# 참고: https://learn.microsoft.com/en-us/dotnet/api/documentformat.openxml.drawing.autonumberschemevalues
+_AUTONUM_STYLES = (
+    "arabicPeriod",   # 1.
+    "arabicParenR",   # 1)
+    "alphaLcParenR",  # a)
+    "alphaUcParenR",  # A)
+    "romanLcParenR",  # i)
+)
+# orderify에서 제거할 기존 불릿 요소의 검색 경로
+_BULLET_PATHS = (f".//{{{_A_URI}}}buChar", f".//{{{_A_URI}}}buAutoNum")
+
+def link_to_slide(run, target_slide, r_ids=None):
+    """
+    run에 target_slide로 이동하는 하이퍼링크를 겁니다.
+    같은 슬라이드(part)의 run들을 연달아 링크할 때 r_ids에 dict를 넘기면 대상 슬라이드별 rId를 재사용해
+    관계 목록을 매번 훑지 않습니다.
+    """
+    target_part = target_slide.part
+    r_id = r_ids.get(target_part) if r_ids is not None else None
+    if r_id is None:
+        r_id = run.part.relate_to(
+            target_part,
+            RT.SLIDE,
+        )
+        if r_ids is not None:
+            r_ids[target_part] = r_id
 
-def link_to_slide(run, target_slide):
-    
-    r_id = run.part.relate_to(
-        target_slide.part,
-        RT.SLIDE,
-    )
-    
     rPr = run._r.get_or_add_rPr()
     
     hlinkClick = rPr.add_hlinkClick(r_id)
     hlinkClick.set('action', 'ppaction://hlinksldjump')
 
 def unbullet(p):
-    p._pPr.insert(
-        0,
-        etree.Element(
-            "{http://schemas.openxmlformats.org/drawingml/2006/main}buNone"
-        ),
-    )
-    p._element.get_or_add_pPr().set("marL", "0")
-    p._element.get_or_add_pPr().set("indent", "0")
+    pPr = p._element.get_or_add_pPr()
+    pPr.insert(0, pPr.makeelement(_BUNONE_TAG))
+    pPr.set("marL", "0")
+    pPr.set("indent", "0")
 
 def titlify(p):
     """
@@ -37,26 +67,19 @@ def titlify(p):
     """
     # <a:defRPr> 요소 생성 또는 가져오기
     pPr = p._element.get_or_add_pPr()
-    defRPr = pPr.find("{http://schemas.openxmlformats.org/drawingml/2006/main}defRPr")
+    defRPr = pPr.find(_DEFRPR_TAG)
     if defRPr is not None:
         # 기존 거 있으면 제거 (덮어쓰기 위해)
         pPr.remove(defRPr)
 
-    defRPr = OxmlElement("a:defRPr")
+    # defRPr 추가
+    defRPr = etree.SubElement(pPr, _DEFRPR_TAG)
 
     # <a:latin typeface="+mj-lt"/>
-    latin = OxmlElement("a:latin")
-    latin.set("typeface", "+mj-lt")
+    etree.SubElement(defRPr, _LATIN_TAG, typeface="+mj-lt")
 
     # <a:ea typeface="+mj-ea"/>
-    ea = OxmlElement("a:ea")
-    ea.set("typeface", "+mj-ea")
-
-    defRPr.append(latin)
-    defRPr.append(ea)
-
-    # defRPr 추가
-    pPr.append(defRPr)
+    etree.SubElement(defRPr, _EA_TAG, typeface="+mj-ea")
 
 
 def orderify(p):
@@ -65,63 +88,59 @@ def orderify(p):
     """
     level = p.level
 
-    # 원하는 스타일 매핑
-    # 참고: https://learn.microsoft.com/en-us/dotnet/api/documentformat.openxml.drawing.autonumberschemevalues
-    style_map = {
-        0: "arabicPeriod",   # 1.
-        1: "arabicParenR",   # 1)
-        2: "alphaLcParenR",  # a)
-        3: "alphaUcParenR",  # A)
-        4: "romanLcParenR",  # i)
-    }
-
-    auto_num_type = style_map.get(level, "arabicPeriod")
+    auto_num_type = _AUTONUM_STYLES[level] if 0 <= level < len(_AUTONUM_STYLES) else "arabicPeriod"
 
     pPr = p._element.get_or_add_pPr()
 
     # 기존 불릿 제거
-    for tag in ["a:buChar", "a:buAutoNum"]:
-        el = pPr.find(f".//{tag}", namespaces={"a": "http://schemas.openxmlformats.org/drawingml/2006/main"})
+    for path in _BULLET_PATHS:
+        el = pPr.find(path)
         if el is not None:
             pPr.remove(el)
 
     # buAutoNum 추가
-    buAutoNum = OxmlElement("a:buAutoNum")
-    buAutoNum.set("type", auto_num_type)
-    pPr.append(buAutoNum)
+    etree.SubElement(pPr, _BUAUTONUM_TAG, type=auto_num_type)
 
 
 def set_highlight(run, color):
     # get run properties
     rPr = run._r.get_or_add_rPr()
-    # Create highlight element
-    hl = OxmlElement("a:highlight")
-    # Create specify RGB Colour element with color specified
-    srgbClr = OxmlElement("a:srgbClr")
-    setattr(srgbClr, "val", color)
-    # Add colour specification to highlight element
-    hl.append(srgbClr)
-    # Add highlight element to run properties
-    setattr(rPr, "lang", MSO_LANGUAGE_ID.ENGLISH_US)
-    setattr(rPr, "altLang", MSO_LANGUAGE_ID.KOREAN)
+    setattr(rPr, "lang", _LANG_EN)
+    setattr(rPr, "altLang", _LANG_KO)
     # lang="en-US" altLang="ko-KR"
-    rPr.append(hl)
-    latin = OxmlElement("a:latin")
+    # Add highlight element with the RGB colour specified to run properties
+    hl = etree.SubElement(rPr, _HIGHLIGHT_TAG)
+    etree.SubElement(hl, _SRGBCLR_TAG, val=color)
     # <a:latin typeface="Consolas" panose="020B0609020204030204" pitchFamily="49" charset="0"/>
-    setattr(latin, "typeface", "Consolas")
-    setattr(latin, "charset", "0")
-    rPr.append(latin)
+    etree.SubElement(rPr, _LATIN_TAG, typeface="Consolas")
     return run
 
 
+@lru_cache(maxsize=256)
+def _parse_name_metadata(name):
+    # 대부분의 도형 이름은 JSON이 아니므로 예외 처리 없이 바로 건너뜁니다.
+    if isinstance(name, str) and name.lstrip().startswith("{"):
+        try:
+            parsed = fastjson.loads(name)
+        except ValueError:
+            parsed = None
+        if isinstance(parsed, dict):
+            return parsed
+    return {}
+
+def name_metadata(name):
+    """
+    도형 이름에 적힌 JSON 메타정보를 딕셔너리로 반환합니다.
+    같은 이름은 슬라이드마다 반복되므로 파싱 결과는 캐시하고, 호출자에게는 복사본을 돌려줍니다.
+    """
+    return dict(_parse_name_metadata(name))
+
+
 def dict_shape(shape, placeholder=None):
     """
     주어진 shape 객체의 속성을 딕셔너리 형태로 반환합니다.
     """
-    try:
-        from_pl = json.loads(placeholder.name)
-    except:
-        from_pl = {}
+    from_pl = name_metadata(placeholder.name) if placeholder is not None else {}
     return {
         "name": shape.name or "",
         "top": shape.top or 0,
@@ -136,44 +155,103 @@ def dict_shape(shape, placeholder=None):
 
 def clear_slides(prs):
     """
-    while 루프를 사용하여 프레젠테이션의 모든 슬라이드를 삭제합니다.
-    각 슬라이드에 대해 rId 관계를 삭제한 후, 슬라이드 ID 요소를 제거합니다.
-    마지막에 임시 파일로 저장 후 재로드하여 내부 구조를 정리합니다.
+    프레젠테이션의 모든 슬라이드를 삭제합니다.
+    모든 슬라이드의 rId 관계를 먼저 삭제한 후, 슬라이드 ID 요소를 한 번에 제거합니다.
+    관계가 끊긴 슬라이드 part는 저장 시 관계 그래프에서 제외되므로 재로드 없이 같은 객체를 반환합니다.
     """
     # _sldIdLst는 슬라이드 ID들의 리스트입니다.
-    while len(prs.slides._sldIdLst) > 0:
-        slide_id = prs.slides._sldIdLst[0]
-        # 슬라이드의 관계(rId)를 삭제합니다.
-        prs.part.drop_rel(slide_id.rId)
-        # 첫 번째 슬라이드를 삭제합니다.
-        prs.slides._sldIdLst.remove(slide_id)
-    # 내부 구조 정리를 위해 임시 파일에 저장 후 재로드
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pptx") as tmp_file:
-        temp_filename = tmp_file.name
-    prs.save(temp_filename)
-    new_prs = Presentation(temp_filename)
-    os.remove(temp_filename)
-    return new_prs
+    sldIdLst = prs.slides._sldIdLst
+    part = prs.part
+    # 슬라이드의 관계(rId)를 삭제합니다.
+    for slide_id in list(sldIdLst):
+        part.drop_rel(slide_id.rId)
+    # 슬라이드 ID 요소를 한 번에 삭제합니다.
+    del sldIdLst[:]
+    return prs
+
+def cache_image_parts(prs):
+    """
+    같은 경로의 이미지를 반복해서 넣을 때 python-pptx가 매번 파일을 읽고 SHA1을 계산한 뒤
+    패키지의 모든 part를 탐색하지 않도록, 패키지의 이미지 part 조회를 경로 기준으로 캐시합니다.
+    insert_picture와 add_picture 모두 이 조회를 거치므로 두 경로에 함께 적용됩니다.
+    """
+    package = prs.part.package
+    get_or_add_image_part = package.get_or_add_image_part
+    image_parts = {}
+
+    def cached_get_or_add_image_part(image_file):
+        if not isinstance(image_file, str):
+            return get_or_add_image_part(image_file)
+        image_part = image_parts.get(image_file)
+        if image_part is None:
+            image_part = image_parts[image_file] = get_or_add_image_part(image_file)
+        return image_part
+
+    package.get_or_add_image_part = cached_get_or_add_image_part
+    return prs
+
+def cache_partnames(prs):
+    """
+    python-pptx는 노트 슬라이드나 이미지 part를 추가할 때마다 패키지의 모든 part를 순회해 다음 번호를 찾으므로
+    슬라이드 수에 대해 O(N²)이 됩니다. 템플릿별로 처음 한 번만 순회하고 이후에는 번호를 하나씩 올려 반환합니다.
+    처음 순회 때 이미 있던 번호는 건너뛰므로 반환되는 partname은 원래 방식과 같습니다.
+    """
+    package = prs.part.package
+    next_partname = package.next_partname
+    next_image_partname = package.next_image_partname
+    # 템플릿 -> [마지막으로 반환한 번호, 처음 순회 때 있던 번호들]
+    counters = {}
+
+    def advance(key, first):
+        counter = counters.get(key)
+        if counter is None:
+            n, taken = first()
+            counters[key] = [n, taken]
+            return n
+        n, taken = counter
+        n += 1
+        while n in taken:
+            n += 1
+        counter[0] = n
+        return n
+
+    def cached_next_partname(tmpl):
+        def first():
+            partname = next_partname(tmpl)
+            prefix = tmpl.partition("%d")[0]
+            taken = {
+                part.partname.idx for part in package.iter_parts()
+                if part.partname.startswith(prefix)
+            }
+            return partname.idx, taken
+        return PackURI(tmpl % advance(tmpl, first))
+
+    def cached_next_image_partname(ext):
+        def first():
+            partname = next_image_partname(ext)
+            taken = {
+                part.partname.idx for part in package.iter_parts()
+                if part.partname.startswith("/ppt/media/image")
+            }
+            return partname.idx, taken
+        return PackURI("/ppt/media/image%d.%s" % (advance("/ppt/media/image", first), ext))
+
+    package.next_partname = cached_next_partname
+    package.next_image_partname = cached_next_image_partname
+    return prs
+
 def boldify(run, width=12700, theme_color="accent3", alpha=0):
     rPr = run._r.get_or_add_rPr()
 
     # 기존 <a:ln> 제거
-    for child in rPr.findall("./a:ln", namespaces=rPr.nsmap):
+    for child in rPr.findall(_LN_TAG):
         rPr.remove(child)
 
-    ln = OxmlElement("a:ln")
-    ln.set("w", str(width))
+    ln = rPr.makeelement(_LN_TAG, w=str(width))
+    rPr.insert(0, ln)
 
-    solidFill = OxmlElement("a:solidFill")
-    schemeClr = OxmlElement("a:schemeClr")
-    schemeClr.set("val", theme_color)
+    solidFill = etree.SubElement(ln, _SOLIDFILL_TAG)
+    schemeClr = etree.SubElement(solidFill, _SCHEMECLR_TAG, val=theme_color)
 
     # alpha 설정
-    alpha_elem = OxmlElement("a:alpha")
-    alpha_elem.set("val", str(alpha))
-    schemeClr.append(alpha_elem)
-
-    solidFill.append(schemeClr)
-    ln.append(solidFill)
-
-    rPr.insert(0, ln)
+    etree.SubElement(schemeClr, _ALPHA_TAG, val=str(alpha))